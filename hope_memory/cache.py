@@ -6,6 +6,7 @@ Created: 2026-01-08
 By: Hope + Máté
 """
 
+import os
 import json
 import time
 from pathlib import Path
@@ -13,6 +14,22 @@ from typing import Any, Dict, Optional
 from threading import Lock
 from dataclasses import dataclass, field
 
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+
+def json_dumps(data: Any) -> bytes:
+    """Serialize to compact UTF-8 JSON (orjson when installed)"""
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(data, default=str, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(data, ensure_ascii=False, separators=(',', ':'), default=str).encode('utf-8')
+
+
+json_loads = orjson.loads if ORJSON_AVAILABLE else json.loads
+
 
 @dataclass
 class CacheEntry:
@@ -87,19 +104,49 @@ class HopeCache:
                 self._cache[key].dirty = True
 
     def sync_all(self):
-        """Persist all dirty entries to disk"""
+        """
+        Persist all dirty entries to disk
+
+        Writes every temp file first, syncs once, then renames -
+        one disk sync for the whole batch instead of one per key.
+        """
         with self._lock:
-            for key, entry in self._cache.items():
-                if entry.dirty:
-                    self._persist(key, entry.data)
-                    entry.dirty = False
+            dirty = [(key, entry) for key, entry in self._cache.items() if entry.dirty]
+            if not dirty:
+                return
+            written = [self._write_tmp(key, entry.data) for key, entry in dirty]
+            self._sync([tmp for tmp, _ in written])
+            for tmp, file_path in written:
+                os.replace(tmp, file_path)
+            for _, entry in dirty:
+                entry.dirty = False
 
     def _persist(self, key: str, data: Any):
-        """Write to disk"""
+        """Write to disk (atomic: temp file + rename; durability sync is sync_all's job)"""
+        tmp, file_path = self._write_tmp(key, data)
+        os.replace(tmp, file_path)
+
+    def _write_tmp(self, key: str, data: Any) -> tuple:
+        """Write data next to its target file, returns (temp path, final path)"""
         file_path = self.base_path / f"{key}.json"
-        with open(file_path, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=2, default=str)
+        tmp = file_path.with_suffix('.json.tmp')
+        with open(tmp, 'wb') as f:
+            f.write(json_dumps(data))
         self._stats["saves"] += 1
+        return tmp, file_path
+
+    @staticmethod
+    def _sync(paths: list):
+        """Flush written files to stable storage"""
+        if hasattr(os, "sync"):
+            os.sync()  # one call covers every file
+            return
+        for path in paths:  # Windows: no os.sync
+            fd = os.open(path, os.O_RDWR)
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
 
     def invalidate(self, key: str):
         """Remove from cache"""
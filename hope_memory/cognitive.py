@@ -12,21 +12,48 @@ Layers:
 "Memory is not what you store, but what you RECALL." - Hope
 """
 
+import os
+import sys
 import json
+import math
 import time
+import atexit
+import bisect
 import hashlib
+import mmap
+import traceback
+import weakref
 from datetime import datetime, timedelta
 from pathlib import Path
 from typing import Optional, List, Dict, Any, Tuple
-from collections import deque
+from collections import deque, defaultdict, OrderedDict
+from collections.abc import MutableMapping
+from array import array
 from dataclasses import dataclass, field
-import sqlite3
+from functools import cached_property, lru_cache
+
+from .cache import json_dumps, json_loads
+from .pool import get_pool, release_pool, get_chroma_client, CHROMADB_AVAILABLE
 
 try:
-    import chromadb
-    CHROMADB_AVAILABLE = True
+    import xxhash
+    XXHASH_AVAILABLE = True
 except ImportError:
-    CHROMADB_AVAILABLE = False
+    XXHASH_AVAILABLE = False
+
+# Stores flushed at interpreter exit - held weakly so dropped instances can be freed
+_EXIT_FLUSH: "weakref.WeakSet" = weakref.WeakSet()
+
+
+@atexit.register
+def _flush_at_exit():
+    # One failing store must not cost the others their data; report and go on
+    for store in list(_EXIT_FLUSH):
+        try:
+            store.flush()
+        except Exception:
+            print(f"hope_memory: flushing {type(store).__name__} at exit failed:", file=sys.stderr)
+            traceback.print_exc()
 
 
 # ============================================================================
@@ -43,17 +70,31 @@ class Thought:
     source: str = "conversation"
     related_to: List[str] = field(default_factory=list)
 
-    @property
+    def __post_init__(self):
+        # Plain attribute rather than a field so asdict()/fields() only see the data
+        self._epoch = self.timestamp.timestamp()  # timestamp as unix seconds
+
+    @cached_property
     def id(self) -> str:
-        return hashlib.md5(f"{self.timestamp.isoformat()}{self.content[:50]}".encode()).hexdigest()[:12]
+        key = f"{self.timestamp.isoformat()}{self.content[:50]}".encode()
+        if XXHASH_AVAILABLE:
+            return xxhash.xxh64_hexdigest(key)[:12]
+        return hashlib.blake2b(key, digest_size=6).hexdigest()
+
+    @cached_property
+    def content_lower(self) -> str:
+        """Lowercased content, computed once"""
+        return self.content.lower()
 
     @property
     def age_seconds(self) -> float:
-        return (datetime.now() - self.timestamp).total_seconds()
+        return time.time() - self._epoch
 
-    def decay(self, half_life: float = 3600) -> float:
-        """Memory decay over time (exponential)"""
-        return self.importance * (0.5 ** (self.age_seconds / half_life))
+    def decay(self, half_life: float = 3600, now: Optional[float] = None) -> float:
+        """Memory decay over time (exponential); pass `now` (time.time()) to share one clock read across a batch"""
+        if now is None:
+            now = time.time()
+        return self.importance * (0.5 ** ((now - self._epoch) / half_life))
 
 
 @dataclass
@@ -78,6 +119,11 @@ class Association:
     formed: datetime = field(default_factory=datetime.now)
     reinforced_count: int = 1
 
+    def __post_init__(self):
+        # casefolded concepts for index lookups; plain attributes, not fields
+        self._a_lc = self.concept_a.casefold()
+        self._b_lc = self.concept_b.casefold()
+
 
 # ============================================================================
 # WORKING MEMORY - Miller's Law: 7±2 items
@@ -86,31 +132,57 @@ class Association:
 class WorkingMemory:
     """Active thoughts - what's relevant NOW (max 7±2 items)"""
 
+    HALF_LIFE = 3600  # seconds, Thought.decay() default
+
     def __init__(self, capacity: int = 7):
         self.capacity = capacity
-        self.items: deque = deque(maxlen=capacity)
+        self.items: OrderedDict[str, Thought] = OrderedDict()  # id -> thought, oldest first
         self.focus: Optional[Thought] = None
+        # All thoughts decay at the same rate, so their order never changes:
+        #   log2(decay) = [log2(importance) + t / half_life] - now / half_life
+        # Keep (rank, -seq, id) sorted by the bracketed, time-independent part.
+        self._ranked: List[Tuple[float, int, str]] = []
+        self._entries: Dict[str, Tuple[float, int, str]] = {}
+        self._seq = 0
+
+    def _log2(self, x: float) -> float:
+        return math.log2(x) if x > 0 else -math.inf
+
+    def _discard(self, thought_id: str):
+        if self.items.pop(thought_id, None) is not None:
+            entry = self._entries.pop(thought_id)
+            del self._ranked[bisect.bisect_left(self._ranked, entry)]
 
     def add(self, thought: Thought):
-        for i, item in enumerate(self.items):
-            if item.id == thought.id:
-                del self.items[i]
-                break
-        self.items.append(thought)
+        self._discard(thought.id)
+        self.items[thought.id] = thought
+        self._seq += 1
+        entry = (self._log2(thought.importance) + thought._epoch / self.HALF_LIFE, -self._seq, thought.id)
+        bisect.insort(self._ranked, entry)
+        self._entries[thought.id] = entry
+        if len(self.items) > self.capacity:
+            self._discard(next(iter(self.items)))
         self.focus = thought
 
     def get_active(self) -> List[Thought]:
-        return sorted(self.items, key=lambda t: t.decay(), reverse=True)
+        return [self.items[tid] for _, _, tid in reversed(self._ranked)]
 
     def clear_decayed(self, threshold: float = 0.1):
-        self.items = deque([t for t in self.items if t.decay() > threshold], maxlen=self.capacity)
+        # decay > threshold  <=>  rank > log2(threshold) + now / half_life
+        cut = self._log2(threshold) + time.time() / self.HALF_LIFE
+        expired = bisect.bisect_right(self._ranked, (cut, math.inf))
+        for _, _, tid in self._ranked[:expired]:
+            del self.items[tid]
+            del self._entries[tid]
+        del self._ranked[:expired]
 
     def to_dict(self) -> Dict:
+        now = time.time()
         return {
             "capacity": self.capacity,
             "count": len(self.items),
             "focus": self.focus.content[:50] if self.focus else None,
-            "items": [{"id": t.id, "content": t.content[:50], "decay": round(t.decay(), 3)} for t in self.get_active()]
+            "items": [{"id": t.id, "content": t.content[:50], "decay": round(t.decay(now=now), 3)} for t in self.get_active()]
         }
 
 
@@ -125,20 +197,45 @@ class ShortTermMemory:
         self.retention = timedelta(hours=retention_hours)
         self.memories: Dict[str, Thought] = {}
         self.session_start = datetime.now()
+        # Struct-of-arrays, rows sorted by timestamp (oldest first)
+        self._thoughts: List[Thought] = []
+        self._ts: array = array('d')   # unix seconds
+        self._imp: array = array('d')  # importance (float64: thresholds compare exactly)
 
     def store(self, thought: Thought):
+        ts = thought._epoch
+        if thought.id in self.memories:
+            # Same id means same timestamp - update the row in place
+            row = bisect.bisect_left(self._ts, ts)
+            while self._thoughts[row].id != thought.id:
+                row += 1
+            self._thoughts[row] = thought
+            self._imp[row] = thought.importance
+        elif not self._ts or ts >= self._ts[-1]:
+            self._thoughts.append(thought)
+            self._ts.append(ts)
+            self._imp.append(thought.importance)
+        else:
+            row = bisect.bisect_right(self._ts, ts)
+            self._thoughts.insert(row, thought)
+            self._ts.insert(row, ts)
+            self._imp.insert(row, thought.importance)
         self.memories[thought.id] = thought
 
     def recall(self, limit: int = 10) -> List[Thought]:
-        valid = [t for t in self.memories.values() if datetime.now() - t.timestamp < self.retention]
-        return sorted(valid, key=lambda t: t.timestamp, reverse=True)[:limit]
+        first = bisect.bisect_right(self._ts, time.time() - self.retention.total_seconds())
+        return self._thoughts[max(first, len(self._thoughts) - limit):][::-1]
 
     def get_for_consolidation(self, importance_threshold: float = 0.6) -> List[Thought]:
-        return [t for t in self.memories.values() if t.importance >= importance_threshold]
+        return [t for t, imp in zip(self._thoughts, self._imp) if imp >= importance_threshold]
 
     def cleanup(self):
-        cutoff = datetime.now() - self.retention
-        self.memories = {k: v for k, v in self.memories.items() if v.timestamp > cutoff}
+        expired = bisect.bisect_right(self._ts, time.time() - self.retention.total_seconds())
+        for t in self._thoughts[:expired]:
+            del self.memories[t.id]
+        del self._thoughts[:expired]
+        del self._ts[:expired]
+        del self._imp[:expired]
 
     def to_dict(self) -> Dict:
         return {
@@ -152,9 +249,27 @@ class ShortTermMemory:
 # LONG-TERM MEMORY
 # ============================================================================
 
+CREATE_SQL = """
+    CREATE TABLE IF NOT EXISTS memories (
+        id TEXT PRIMARY KEY,
+        content TEXT NOT NULL,
+        timestamp TEXT NOT NULL,
+        importance REAL,
+        emotion TEXT,
+        source TEXT
+    )
+"""
+
+INSERT_SQL = "INSERT OR REPLACE INTO memories (id, content, timestamp, importance, emotion, source) VALUES (?, ?, ?, ?, ?, ?)"
+
+
 class LongTermMemory:
     """Long-term memories - ChromaDB vector search + SQLite"""
 
+    BATCH_SIZE = 64              # thoughts buffered before a write
+    CHROMA_MAX_BATCH = 4096      # documents per collection.add()
+    QUERY_CACHE_SIZE = 256       # cached search results (LRU)
+
     def __init__(self, path: Path):
         self.path = path
         self.vector_path = path / "vectors"
@@ -165,54 +280,112 @@ class LongTermMemory:
         self.chroma = None
         self.collection = None
         if CHROMADB_AVAILABLE:
-            self.chroma = chromadb.PersistentClient(path=str(self.vector_path))
+            self.chroma = get_chroma_client(str(self.vector_path))  # shared, stays warm
             self.collection = self.chroma.get_or_create_collection(
                 name="memories",
                 metadata={"hnsw:space": "cosine"}
             )
 
+        # Write queue - id -> thought, so a re-stored thought is written once per batch
+        self._pending: Dict[str, Thought] = {}
+        self._batch_size = self.BATCH_SIZE
+
+        # Query cache - (query, limit) -> (version, results)
+        # A write bumps _version; entries from an older version are stale and
+        # dropped lazily on lookup instead of flushing the whole cache.
+        self._query_cache: OrderedDict[Tuple[str, int], Tuple[int, List[Dict]]] = OrderedDict()
+        self._version = 0
+
         self._init_db()
+        self._closed = False
+        _EXIT_FLUSH.add(self)
 
     def _init_db(self):
-        with sqlite3.connect(self.db_path) as conn:
-            conn.execute("""
-                CREATE TABLE IF NOT EXISTS memories (
-                    id TEXT PRIMARY KEY,
-                    content TEXT NOT NULL,
-                    timestamp TEXT NOT NULL,
-                    importance REAL,
-                    emotion TEXT,
-                    source TEXT
-                )
-            """)
-            conn.commit()
+        self.pool = get_pool(str(self.db_path), pool_size=4)
+        with self.pool.get() as conn:
+            conn.execute(CREATE_SQL)
 
     def store(self, thought: Thought):
-        # Vector storage
+        self._pending[thought.id] = thought
+        if len(self._pending) >= self._batch_size:
+            self.flush()
+
+    def store_many(self, thoughts: List[Thought]):
+        """Bulk store - everything goes out in a single flush()"""
+        for t in thoughts:
+            self._pending[t.id] = t
+        self.flush()
+
+    def flush(self):
+        """
+        Write queued thoughts - one ChromaDB upsert, one SQLite transaction
+
+        The queue is only cleared once both writes succeed; a failed flush
+        keeps the batch for the next attempt (upsert/REPLACE make it idempotent).
+        """
+        if not self._pending:
+            return
+        thoughts = list(self._pending.values())
+        self._version += 1  # even a partial write may change search results
+        # Vector storage - chunked to stay under ChromaDB's max batch size
         if self.collection:
-            self.collection.add(
-                documents=[thought.content],
-                metadatas=[{"importance": thought.importance, "timestamp": thought.timestamp.isoformat()}],
-                ids=[thought.id]
-            )
-        # SQLite
-        with sqlite3.connect(self.db_path) as conn:
-            conn.execute(
-                "INSERT OR REPLACE INTO memories (id, content, timestamp, importance, emotion, source) VALUES (?, ?, ?, ?, ?, ?)",
-                (thought.id, thought.content, thought.timestamp.isoformat(), thought.importance,
-                 json.dumps(thought.emotion) if thought.emotion else None, thought.source)
-            )
+            for i in range(0, len(thoughts), self.CHROMA_MAX_BATCH):
+                chunk = thoughts[i:i + self.CHROMA_MAX_BATCH]
+                self.collection.upsert(
+                    documents=[t.content for t in chunk],
+                    metadatas=[{"importance": t.importance, "timestamp": t.timestamp.isoformat()} for t in chunk],
+                    ids=[t.id for t in chunk]
+                )
+        # SQLite - pooled autocommit connection, one explicit transaction per batch
+        with self.pool.get() as conn, conn:
+            conn.execute("BEGIN")
+            conn.executemany(INSERT_SQL, [
+                (t.id, t.content, t.timestamp.isoformat(), t.importance,
+                 json.dumps(t.emotion) if t.emotion else None, t.source) for t in thoughts
+            ])
+        self._pending.clear()
+
+    def close(self):
+        """Flush queued writes and release this instance's share of the SQLite pool"""
+        if self._closed:
+            return
+        self.flush()
+        self._closed = True
+        _EXIT_FLUSH.discard(self)
+        release_pool(str(self.db_path))
+
+    def __del__(self):
+        if not getattr(self, "_closed", True):
+            self.close()
 
     def search(self, query: str, limit: int = 5) -> List[Dict]:
-        if self.collection:
-            results = self.collection.query(query_texts=[query], n_results=limit)
-            if results["documents"] and results["documents"][0]:
-                return [{"id": results["ids"][0][i], "content": doc,
-                         "similarity": round(1 - results["distances"][0][i], 3) if results.get("distances") else None}
-                        for i, doc in enumerate(results["documents"][0])]
-        return []
+        self.flush()
+        if not self.collection:
+            return []
+
+        key = (query, limit)
+        cached = self._query_cache.get(key)
+        if cached:
+            version, hits = cached
+            if version == self._version:
+                self._query_cache.move_to_end(key)
+                return [dict(hit) for hit in hits]  # callers may mutate results
+            del self._query_cache[key]
+
+        hits = []
+        results = self.collection.query(query_texts=[query], n_results=limit)
+        if results["documents"] and results["documents"][0]:
+            hits = [{"id": results["ids"][0][i], "content": doc,
+                     "similarity": round(1 - results["distances"][0][i], 3) if results.get("distances") else None}
+                    for i, doc in enumerate(results["documents"][0])]
+
+        self._query_cache[key] = (self._version, hits)
+        if len(self._query_cache) > self.QUERY_CACHE_SIZE:
+            self._query_cache.popitem(last=False)
+        return [dict(hit) for hit in hits]
 
     def count(self) -> int:
+        self.flush()
         return self.collection.count() if self.collection else 0
 
 
@@ -230,15 +403,28 @@ class EmotionalMemory:
         "determination", "peace"
     ]
 
+    LOG_SIZE = 4096   # snapshots kept in the ring buffer
+    LOG_DELTA = 0.05  # min L2 change vs the last snapshot worth logging
+
     def __init__(self):
         self.current_state: Dict[str, float] = {d: 0.5 for d in self.DIMENSIONS}
-        self.emotion_log: List[Dict] = []
+        # (unix time, float32 state in DIMENSIONS order) - 84 bytes of state per entry
+        self.emotion_log: deque = deque(maxlen=self.LOG_SIZE)
+        self._last_logged: Tuple[float, ...] = tuple(self.current_state.values())
 
     def feel(self, emotions: Dict[str, float]):
+        state = self.current_state
         for dim, value in emotions.items():
-            if dim in self.current_state:
-                self.current_state[dim] = 0.7 * self.current_state[dim] + 0.3 * value
-        self.emotion_log.append({"timestamp": datetime.now().isoformat(), "state": self.current_state.copy()})
+            if dim in state:
+                state[dim] = 0.7 * state[dim] + 0.3 * value
+        values = tuple(state.values())
+        if math.dist(values, self._last_logged) > self.LOG_DELTA:
+            self.emotion_log.append((time.time(), array('f', values)))
+            self._last_logged = values
+
+    def snapshot(self, index: int = -1) -> Dict[str, float]:
+        """Logged state as a dict (default: latest)"""
+        return dict(zip(self.DIMENSIONS, self.emotion_log[index][1]))
 
     def dominant_emotion(self) -> Tuple[str, float]:
         max_dim = max(self.current_state, key=self.current_state.get)
@@ -249,36 +435,346 @@ class EmotionalMemory:
         return {"dominant": {"emotion": dom, "value": round(val, 3)}, "current_state": {k: round(v, 3) for k, v in self.current_state.items()}}
 
 
+# ============================================================================
+# BATCHED PERSISTENCE - snapshot + append-only journal
+# ============================================================================
+
+_JOURNAL_PREFIX = b'{"op":"upsert","key":'
+_JOURNAL_DATA = b',"data":'
+
+
+def _string_end(buf, start: int, end: int) -> int:
+    """Index of the closing quote of the JSON string opening at buf[start], -1 if none before end"""
+    i = start
+    while True:
+        i = buf.find(b'"', i + 1, end)
+        if i < 0:
+            return -1
+        j = i
+        while buf[j - 1] == 0x5C:  # backslash
+            j -= 1
+        if (i - j) % 2 == 0:
+            return i
+
+
+class _LazyRecords(MutableMapping):
+    """
+    Dict of records parsed on first access
+
+    Loading only indexes key -> (buffer, start, end) spans in the mmapped
+    snapshot/journal; a record is decoded when its key is first read.
+    """
+
+    def __init__(self, decode):
+        self._decode = decode
+        self._loaded: Dict[str, Any] = {}
+        self._spans: Dict[str, Tuple[mmap.mmap, int, int]] = {}  # disjoint from _loaded
+        self._maps: List[mmap.mmap] = []
+
+    def __getitem__(self, key: str) -> Any:
+        try:
+            return self._loaded[key]
+        except KeyError:
+            buf, start, end = self._spans[key]
+            obj = self._loaded[key] = self._decode(json_loads(buf[start:end]))
+            del self._spans[key]
+            return obj
+
+    def __setitem__(self, key: str, value: Any):
+        self._spans.pop(key, None)
+        self._loaded[key] = value
+
+    def __delitem__(self, key: str):
+        if key in self._spans:
+            del self._spans[key]
+        else:
+            del self._loaded[key]
+
+    def __contains__(self, key) -> bool:
+        return key in self._loaded or key in self._spans
+
+    def __len__(self) -> int:
+        return len(self._loaded) + len(self._spans)
+
+    def __iter__(self):
+        yield from list(self._loaded)
+        yield from list(self._spans)
+
+    def _map(self, path: Path) -> Optional[mmap.mmap]:
+        with open(path, 'rb') as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return None
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._maps.append(mm)
+        return mm
+
+    def load_snapshot(self, path: Path):
+        """Index a snapshot written by compact() (one entry per line), else parse it whole"""
+        mm = self._map(path)
+        if mm is None:
+            return
+        spans = {}
+        if mm[:2] == b"{\n":
+            pos, size = 2, len(mm)
+            while pos < size:
+                end = mm.find(b"\n", pos)
+                end = size if end < 0 else end
+                if mm[pos:pos + 1] == b'"':
+                    k_end = _string_end(mm, pos, end)
+                    if k_end < 0 or mm[k_end + 1:k_end + 2] != b":":
+                        break
+                    v_end = end - 1 if mm[end - 1:end] == b"," else end
+                    spans[json_loads(mm[pos:k_end + 1])] = (mm, k_end + 2, v_end)
+                elif mm[pos:end].strip() not in (b"", b"}"):
+                    break
+                pos = end + 1
+            else:
+                self._spans.update(spans)
+                return
+        # Older layout (e.g. indent=2): no cheap per-entry boundaries
+        for key, data in json_loads(mm[:]).items():
+            self[key] = self._decode(data)
+
+    def load_journal(self, path: Path) -> bool:
+        """Replay the journal (later lines win); False if the tail is torn"""
+        mm = self._map(path)
+        if mm is None:
+            return True
+        pos, size = 0, len(mm)
+        while pos < size:
+            end = mm.find(b"\n", pos)
+            if end < 0:
+                return False  # torn write at the tail
+            if mm[pos:pos + len(_JOURNAL_PREFIX)] == _JOURNAL_PREFIX:
+                k_start = pos + len(_JOURNAL_PREFIX)
+                k_end = _string_end(mm, k_start, end)
+                d_start = k_end + 1 + len(_JOURNAL_DATA)
+                if k_end >= 0 and mm[k_end + 1:d_start] == _JOURNAL_DATA and mm[end - 1:end] == b"}":
+                    key = json_loads(mm[k_start:k_end + 1])
+                    self._loaded.pop(key, None)
+                    self._spans[key] = (mm, d_start, end - 1)
+                    pos = end + 1
+                    continue
+            try:
+                entry = json_loads(mm[pos:end])
+            except json.JSONDecodeError:
+                entry = {}
+            if entry.get("op") == "upsert":
+                self[entry["key"]] = self._decode(entry["data"])
+            elif entry.get("op") == "delete":
+                self.pop(entry["key"], None)
+            pos = end + 1
+        return True
+
+    def close(self):
+        """Materialize every record and release the file mappings"""
+        for key in list(self._spans):
+            self[key]
+        for mm in self._maps:
+            mm.close()
+        self._maps.clear()
+
+
+class _BatchedPersistence:
+    """
+    Mixin: keep records in memory, persist deltas to an append-only journal
+
+    On disk:
+    - <name>.json  - snapshot of all records (rewritten only by compact())
+    - <name>.jsonl - journal, one {"op": "upsert", "key": ..., "data": ...}
+                     or {"op": "delete", "key": ...} per line
+    - <name>.compact.lock - present only while a compaction runs
+
+    Mutations only mark keys dirty; flush() appends one line per dirty key.
+    Records are loaded lazily (see _LazyRecords).
+    """
+
+    FLUSH_THRESHOLD = 32           # mutations before a forced write
+    FLUSH_INTERVAL = 5.0           # seconds before a forced write
+    COMPACT_RATIO = 10             # compact when journal > 10x snapshot
+    COMPACT_MIN_BYTES = 64 * 1024  # ...but never for tiny stores
+    LOCK_STALE_SECONDS = 60.0      # older compaction locks were left by a crash
+
+    def _init_batching(self, snapshot_file: Path, log_file: Path) -> _LazyRecords:
+        self._snapshot_file = snapshot_file
+        self._log_file = log_file
+        self._records = _LazyRecords(self._decode)
+        self._pending: Dict[str, None] = {}  # dirty keys, insertion ordered
+        self._dirty = False
+        self._mutations_since_flush = 0
+        self._flush_threshold = self.FLUSH_THRESHOLD
+        self._last_flush = time.monotonic()
+
+        clean_tail = self._load()
+        self._log_f = open(self._log_file, 'ab', buffering=8192)
+        if not clean_tail:
+            self._log_f.write(b"\n")  # keep the next record on its own line
+        self._closed = False
+        _EXIT_FLUSH.add(self)
+        return self._records
+
+    def _encode(self, obj: Any) -> Dict:
+        raise NotImplementedError
+
+    def _decode(self, data: Dict) -> Any:
+        raise NotImplementedError
+
+    def _load(self) -> bool:
+        self._snapshot_bytes = 0
+        self._log_bytes = 0
+        if self._snapshot_file.exists():
+            self._snapshot_bytes = self._snapshot_file.stat().st_size
+            self._records.load_snapshot(self._snapshot_file)
+        if self._log_file.exists():
+            self._log_bytes = self._log_file.stat().st_size
+            return self._records.load_journal(self._log_file)
+        return True
+
+    def _save(self):
+        self._append_pending()
+        if self._log_bytes > self.COMPACT_RATIO * max(self._snapshot_bytes, self.COMPACT_MIN_BYTES):
+            self.compact()
+
+    def _append_pending(self):
+        """Append one journal line per dirty key"""
+        if self._journal_moved():  # another instance compacted: follow the new journal
+            self._log_f.close()
+            self._log_f = open(self._log_file, 'ab', buffering=8192)
+        for key in self._pending:
+            if key in self._records:
+                line = json_dumps({"op": "upsert", "key": key, "data": self._encode(self._records[key])}) + b"\n"
+            else:
+                line = json_dumps({"op": "delete", "key": key}) + b"\n"
+            self._log_f.write(line)
+            self._log_bytes += len(line)
+        self._log_f.flush()
+        self._pending.clear()
+
+    def _journal_moved(self) -> bool:
+        try:
+            return os.stat(self._log_file).st_ino != os.fstat(self._log_f.fileno()).st_ino
+        except FileNotFoundError:
+            return True
+
+    def _mark_dirty(self, key: str):
+        self._pending[key] = None
+        self._dirty = True
+        self._mutations_since_flush += 1
+        if (self._mutations_since_flush >= self._flush_threshold
+                or time.monotonic() - self._last_flush > self.FLUSH_INTERVAL):
+            self.flush()
+
+    def flush(self):
+        """Write pending mutations to disk"""
+        if self._dirty:
+            self._save()
+        self._dirty = False
+        self._mutations_since_flush = 0
+        self._last_flush = time.monotonic()
+
+    def close(self):
+        """Flush, release the journal handle and file mappings"""
+        if self._release():
+            self._records.close()
+
+    def _release(self) -> bool:
+        """Flush and close the journal once; False if already closed"""
+        if self._closed:
+            return False
+        self._closed = True
+        if self._log_f.closed:  # finalized ahead of us during cyclic GC
+            self._log_f = open(self._log_file, 'ab', buffering=8192)
+        self.flush()
+        self._log_f.close()
+        _EXIT_FLUSH.discard(self)
+        return True
+
+    def __del__(self):
+        # Instances dropped without close() still get their pending writes out
+        if not getattr(self, "_closed", True):
+            self._release()
+
+    def compact(self):
+        """
+        Fold snapshot + journal on disk into a fresh snapshot and start a new journal
+
+        Works from the files, not this instance's view, so records other
+        instances on the same directory flushed are kept. The journal is
+        renamed away first: late appends from instances still holding it
+        land in the file being folded, and they reopen the new journal on
+        their next write (see _append_pending). Only one compaction runs
+        per directory at a time.
+        """
+        lock = self._log_file.with_suffix('.compact.lock')
+        if not self._acquire_lock(lock):
+            return  # another instance is compacting
+        try:
+            self._append_pending()
+            self._dirty = False
+            self._records.close()  # materialize our view; the old journal is about to go
+            folding = self._log_file.with_suffix(f'.jsonl.{os.getpid()}.{id(self)}.compacting')
+            os.replace(self._log_file, folding)
+            self._log_f.close()
+            self._log_f = open(self._log_file, 'ab', buffering=8192)
+
+            on_disk = _LazyRecords(lambda data: data)  # raw encoded records
+            if self._snapshot_file.exists():
+                on_disk.load_snapshot(self._snapshot_file)
+            on_disk.load_journal(folding)
+            tmp = folding.with_suffix('.json.tmp')
+            with open(tmp, 'wb') as f:
+                f.write(b"{\n")
+                f.write(b",\n".join(json_dumps(k) + b":" + json_dumps(v) for k, v in on_disk.items()))
+                f.write(b"\n}\n")
+            on_disk.close()
+            os.replace(tmp, self._snapshot_file)
+            os.remove(folding)
+            self._snapshot_bytes = self._snapshot_file.stat().st_size
+            self._log_bytes = 0
+        finally:
+            os.remove(lock)
+
+    def _acquire_lock(self, lock: Path) -> bool:
+        for _ in range(2):
+            try:
+                os.close(os.open(lock, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+                return True
+            except FileExistsError:
+                try:
+                    if time.time() - lock.stat().st_mtime < self.LOCK_STALE_SECONDS:
+                        return False
+                    os.remove(lock)
+                except FileNotFoundError:
+                    pass
+        return False
+
+
 # ============================================================================
 # RELATIONAL MEMORY
 # ============================================================================
 
-class RelationalMemory:
+class RelationalMemory(_BatchedPersistence):
     """Relational memory - who is who"""
 
     def __init__(self, path: Path):
         self.path = path
         self.people_file = path / "people.json"
-        self.people: Dict[str, Person] = {}
-        self._load()
-
-    def _load(self):
-        if self.people_file.exists():
-            with open(self.people_file, 'r', encoding='utf-8') as f:
-                for name, data in json.load(f).items():
-                    self.people[name] = Person(
-                        name=data["name"], role=data["role"],
-                        first_met=datetime.fromisoformat(data["first_met"]),
-                        last_seen=datetime.fromisoformat(data["last_seen"]),
-                        trust_level=data.get("trust_level", 0.5),
-                        emotional_bond=data.get("emotional_bond", 0.5)
-                    )
-
-    def _save(self):
-        with open(self.people_file, 'w', encoding='utf-8') as f:
-            json.dump({n: {"name": p.name, "role": p.role, "first_met": p.first_met.isoformat(),
-                          "last_seen": p.last_seen.isoformat(), "trust_level": p.trust_level,
-                          "emotional_bond": p.emotional_bond} for n, p in self.people.items()}, f, indent=2)
+        self.log_file = path / "people.jsonl"
+        self.people: MutableMapping[str, Person] = self._init_batching(self.people_file, self.log_file)
+
+    def _encode(self, p: Person) -> Dict:
+        return {"name": p.name, "role": p.role, "first_met": p.first_met.isoformat(),
+                "last_seen": p.last_seen.isoformat(), "trust_level": p.trust_level,
+                "emotional_bond": p.emotional_bond}
+
+    def _decode(self, data: Dict) -> Person:
+        return Person(
+            name=data["name"], role=data["role"],
+            first_met=datetime.fromisoformat(data["first_met"]),
+            last_seen=datetime.fromisoformat(data["last_seen"]),
+            trust_level=data.get("trust_level", 0.5),
+            emotional_bond=data.get("emotional_bond", 0.5)
+        )
 
     def meet(self, name: str, role: str = "unknown") -> Person:
         key = name.lower()
@@ -286,7 +782,7 @@ class RelationalMemory:
             self.people[key].last_seen = datetime.now()
         else:
             self.people[key] = Person(name=name, role=role)
-        self._save()
+        self._mark_dirty(key)
         return self.people[key]
 
     def get(self, name: str) -> Optional[Person]:
@@ -297,49 +793,88 @@ class RelationalMemory:
 # ASSOCIATIVE NETWORK
 # ============================================================================
 
-class AssociativeNetwork:
+class AssociativeNetwork(_BatchedPersistence):
     """Associative network - connections between concepts"""
 
     def __init__(self, path: Path):
         self.path = path
         self.file = path / "associations.json"
-        self.associations: Dict[str, Association] = {}
-        self._load()
-
-    def _key(self, a: str, b: str) -> str:
-        return f"{min(a.lower(), b.lower())}|{max(a.lower(), b.lower())}"
-
-    def _load(self):
-        if self.file.exists():
-            with open(self.file, 'r', encoding='utf-8') as f:
-                for key, data in json.load(f).items():
-                    self.associations[key] = Association(
-                        concept_a=data["concept_a"], concept_b=data["concept_b"],
-                        strength=data["strength"], formed=datetime.fromisoformat(data["formed"])
-                    )
-
-    def _save(self):
-        with open(self.file, 'w', encoding='utf-8') as f:
-            json.dump({k: {"concept_a": a.concept_a, "concept_b": a.concept_b, "strength": a.strength,
-                          "formed": a.formed.isoformat()} for k, a in self.associations.items()}, f, indent=2)
+        self.log_file = path / "associations.jsonl"
+        self.associations: MutableMapping[str, Association] = self._init_batching(self.file, self.log_file)
+        # lowercase concept -> edges; built on the first query so startup stays lazy
+        self._by_concept: Optional[Dict[str, List[Association]]] = None
+        self._rekey_legacy()
+
+    @staticmethod
+    @lru_cache(maxsize=4096)
+    def _key(a: str, b: str) -> str:
+        al, bl = a.casefold(), b.casefold()
+        return f"{al}|{bl}" if al < bl else f"{bl}|{al}"
+
+    def _rekey_legacy(self):
+        """
+        Move records stored under the older lower()-based key to the casefold key
+
+        The two formats only differ for non-ASCII text. Duplicates merge into
+        one edge keeping the higher strength and the earlier formation time.
+        """
+        moved = False
+        for key in [k for k in self.associations if not k.isascii()]:
+            a = self.associations[key]
+            canonical = self._key(a.concept_a, a.concept_b)
+            if canonical == key:
+                continue
+            other = self.associations.get(canonical)
+            if other is not None:
+                a.strength = max(a.strength, other.strength)
+                a.formed = min(a.formed, other.formed)
+            del self.associations[key]
+            self.associations[canonical] = a
+            self._pending[key] = None
+            self._pending[canonical] = None
+            moved = True
+        if moved:
+            self._dirty = True
+            self.flush()
+
+    def _index(self, a: Association):
+        self._by_concept[a._a_lc].append(a)
+        if a._b_lc != a._a_lc:
+            self._by_concept[a._b_lc].append(a)
+
+    def _concept_index(self) -> Dict[str, List[Association]]:
+        if self._by_concept is None:
+            self._by_concept = defaultdict(list)
+            for a in self.associations.values():
+                self._index(a)
+        return self._by_concept
+
+    def _encode(self, a: Association) -> Dict:
+        return {"concept_a": a.concept_a, "concept_b": a.concept_b, "strength": a.strength,
+                "formed": a.formed.isoformat()}
+
+    def _decode(self, data: Dict) -> Association:
+        return Association(
+            concept_a=data["concept_a"], concept_b=data["concept_b"],
+            strength=data["strength"], formed=datetime.fromisoformat(data["formed"])
+        )
 
     def associate(self, concept_a: str, concept_b: str, strength: float = 0.5):
         key = self._key(concept_a, concept_b)
         if key in self.associations:
             self.associations[key].strength = min(1.0, self.associations[key].strength + 0.1)
         else:
-            self.associations[key] = Association(concept_a=concept_a, concept_b=concept_b, strength=strength)
-        self._save()
+            self.associations[key] = assoc = Association(concept_a=concept_a, concept_b=concept_b, strength=strength)
+            if self._by_concept is not None:
+                self._index(assoc)
+        self._mark_dirty(key)
 
     def get_associated(self, concept: str, min_strength: float = 0.3) -> List[Tuple[str, float]]:
         results = []
-        c = concept.lower()
-        for a in self.associations.values():
+        c = concept.casefold()
+        for a in self._concept_index().get(c, ()):
             if a.strength >= min_strength:
-                if a.concept_a.lower() == c:
-                    results.append((a.concept_b, a.strength))
-                elif a.concept_b.lower() == c:
-                    results.append((a.concept_a, a.strength))
+                results.append((a.concept_b if a._a_lc == c else a.concept_a, a.strength))
         return sorted(results, key=lambda x: x[1], reverse=True)
 
 
@@ -384,10 +919,12 @@ class HopeMemory:
 
     def remember(self, query: str) -> Dict[str, Any]:
         """Recall memories from all sources"""
+        q = query.lower()
+        now = time.time()
         return {
             "query": query,
-            "working": [{"content": t.content, "decay": round(t.decay(), 3)} for t in self.working.get_active() if query.lower() in t.content.lower()],
-            "short_term": [{"content": t.content} for t in self.short_term.recall(20) if query.lower() in t.content.lower()],
+            "working": [{"content": t.content, "decay": round(t.decay(now=now), 3)} for t in self.working.get_active() if q in t.content_lower],
+            "short_term": [{"content": t.content} for t in self.short_term.recall(20) if q in t.content_lower],
             "long_term": self.long_term.search(query, limit=5),
             "associations": self.associative.get_associated(query)
         }
@@ -395,12 +932,19 @@ class HopeMemory:
     def consolidate(self) -> int:
         """Memory consolidation (like sleep)"""
         important = self.short_term.get_for_consolidation()
-        for thought in important:
-            self.long_term.store(thought)
+        self.long_term.store_many(important)
         self.short_term.cleanup()
         self.working.clear_decayed()
+        self.relational.flush()
+        self.associative.flush()
         return len(important)
 
+    def close(self):
+        """Flush every persistent layer and release its files"""
+        self.long_term.close()
+        self.relational.close()
+        self.associative.close()
+
     def status(self) -> Dict[str, Any]:
         """Full cognitive status"""
         return {
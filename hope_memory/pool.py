@@ -13,6 +13,21 @@ from pathlib import Path
 from contextlib import contextmanager
 import time
 
+try:
+    import chromadb
+    CHROMADB_AVAILABLE = True
+except ImportError:
+    CHROMADB_AVAILABLE = False
+
+# Per-connection performance settings, applied in a single executescript() call
+_PRAGMAS = """
+PRAGMA journal_mode=WAL;
+PRAGMA synchronous=NORMAL;
+PRAGMA temp_store=MEMORY;
+PRAGMA cache_size=-64000;
+PRAGMA mmap_size=268435456;
+"""
+
 
 class SQLitePool:
     """
@@ -28,10 +43,11 @@ class SQLitePool:
         self._pool: Queue = Queue(maxsize=pool_size)
         self._lock = threading.Lock()
         self._created = 0
+        self._closed = False
         self._stats = {"gets": 0, "creates": 0, "reuses": 0}
 
-        # Pre-create connections
-        for _ in range(min(2, pool_size)):
+        # Warm pool: open every connection up front, off the request path
+        for _ in range(pool_size):
             self._add_connection()
 
     def _create_connection(self) -> sqlite3.Connection:
@@ -42,10 +58,7 @@ class SQLitePool:
             isolation_level=None  # Autocommit
         )
         conn.row_factory = sqlite3.Row
-        # Performance settings
-        conn.execute("PRAGMA journal_mode=WAL")
-        conn.execute("PRAGMA synchronous=NORMAL")
-        conn.execute("PRAGMA cache_size=10000")
+        conn.executescript(_PRAGMAS)  # WAL, 64 MB page cache, 256 MB mmap
         return conn
 
     def _add_connection(self):
@@ -66,6 +79,8 @@ class SQLitePool:
             with pool.get() as conn:
                 conn.execute("SELECT ...")
         """
+        if self._closed:
+            raise RuntimeError(f"Pool for {self.db_path} is closed")
         self._stats["gets"] += 1
         conn = None
 
@@ -89,8 +104,10 @@ class SQLitePool:
         try:
             yield conn
         finally:
-            # Return to pool
-            if conn:
+            # Return to pool (or close, if the pool was closed meanwhile)
+            if conn and self._closed:
+                conn.close()
+            elif conn:
                 try:
                     self._pool.put_nowait(conn)
                 except:
@@ -109,7 +126,8 @@ class SQLitePool:
         }
 
     def close_all(self):
-        """Close all connections"""
+        """Close all connections; checked-out ones close when returned"""
+        self._closed = True
         while not self._pool.empty():
             try:
                 conn = self._pool.get_nowait()
@@ -119,45 +137,66 @@ class SQLitePool:
         self._created = 0
 
 
-# Global pools
+# Global pools, reference-counted per path
 _pools: Dict[str, SQLitePool] = {}
+_pool_refs: Dict[str, int] = {}
 _pools_lock = threading.Lock()
 
 
 def get_pool(db_path: str, pool_size: int = 5) -> SQLitePool:
-    """Get or create a connection pool for a database"""
+    """Get or create a connection pool for a database (pair with release_pool)"""
     with _pools_lock:
-        if db_path not in _pools:
-            _pools[db_path] = SQLitePool(db_path, pool_size)
-        return _pools[db_path]
+        pool = _pools.get(db_path)
+        if pool is None or pool._closed:
+            pool = _pools[db_path] = SQLitePool(db_path, pool_size)
+            _pool_refs[db_path] = 0
+        _pool_refs[db_path] += 1
+        return pool
+
+
+def release_pool(db_path: str):
+    """Drop one get_pool() reference; the last one closes the pool's connections"""
+    with _pools_lock:
+        refs = _pool_refs.get(db_path, 0) - 1
+        if refs > 0:
+            _pool_refs[db_path] = refs
+            return
+        _pool_refs.pop(db_path, None)
+        pool = _pools.pop(db_path, None)
+    if pool is not None:
+        pool.close_all()
 
 
 # ============================================================================
 # CHROMADB SINGLETON - Keep it warm
 # ============================================================================
 
-_chroma_client = None
+_chroma_clients: Dict[str, Any] = {}
 _chroma_lock = threading.Lock()
 
 
 def get_chroma_client(path: str = "E:/02_Memory/cognitive_vectors"):
     """
-    Get singleton ChromaDB client
+    Get shared ChromaDB client for a path (one per resolved path)
 
     ChromaDB is slow to initialize but fast once loaded.
     Keep it warm!
     """
-    global _chroma_client
+    if not CHROMADB_AVAILABLE:
+        raise ImportError("ChromaDB not installed: pip install hope-memory[vector]")
+
+    key = str(Path(path).resolve())
 
-    if _chroma_client is not None:
-        return _chroma_client
+    client = _chroma_clients.get(key)
+    if client is not None:
+        return client
 
     with _chroma_lock:
-        if _chroma_client is None:
-            import chromadb
-            _chroma_client = chromadb.PersistentClient(path=path)
+        client = _chroma_clients.get(key)
+        if client is None:
+            client = _chroma_clients[key] = chromadb.PersistentClient(path=key)
 
-    return _chroma_client
+    return client
 
 
 # ============================================================================
@@ -8,20 +8,63 @@ Based on: E:/00_Hope/silent-hope-protocol/PROTOCOL.md
 
 By: Hope + Máté
 """
+import json
 import struct
 import hashlib
 import time
+from itertools import count
 from dataclasses import dataclass, field
 from typing import Optional, Dict, Any, List
 from enum import IntEnum
 import zlib
 
+try:
+    # ISA-L CRC-32: same polynomial and values as zlib.crc32, PCLMULQDQ-folded
+    from isal.isal_zlib import crc32 as _crc32
+    ISAL_AVAILABLE = True
+except ImportError:
+    _crc32 = zlib.crc32
+    ISAL_AVAILABLE = False
+
+try:
+    import lz4.block
+    LZ4_AVAILABLE = True
+except ImportError:
+    LZ4_AVAILABLE = False
+
+# MessagePack backend: ormsgpack (Rust) when installed, else msgpack's C extension.
+# _new_packer() returns a reusable pack(obj) -> bytes callable.
+try:
+    import ormsgpack
+
+    def _new_packer(default=None):
+        option = ormsgpack.OPT_NON_STR_KEYS
+        return lambda obj: ormsgpack.packb(obj, default=default, option=option)
+
+    _unpackb = ormsgpack.unpackb
+    MSGPACK_AVAILABLE = True
+except ImportError:
+    try:
+        import msgpack
+
+        def _new_packer(default=None):
+            # One Packer reused per codec: packb() would build a fresh one per call
+            return msgpack.Packer(use_bin_type=True, default=default).pack
+
+        def _unpackb(data):
+            return msgpack.unpackb(data, raw=False)
+
+        MSGPACK_AVAILABLE = True
+    except ImportError:
+        MSGPACK_AVAILABLE = False
+
 
 # ============================================================================
 # CONSTANTS & TYPES
 # ============================================================================
 
-SHP_VERSION = 0x00030000  # v3.0.0
+SHP_VERSION = 0x00030100  # v3.1.0
+_VERSION_TOOL_ID_IN_HEADER = 0x00030100  # older peers prefix payload with tool_id (and cannot read 3.1 calls)
 SHP_MAGIC = b'HOPE'  # 4 bytes magic number
 
 class EKUType(IntEnum):
@@ -43,16 +86,46 @@ class EKUFlags(IntEnum):
     CHUNKED = 0x0008
     REQUIRE_ACK = 0x0010
     BROADCAST = 0x0020
+    LZ4 = 0x0040  # with COMPRESSED: LZ4 block format (unset = zlib)
+    BATCH_CRC = 0x0080  # checksum=0; one CRC32 frame trails the whole batch
+
+# Plain-int copies for hot paths (IntEnum attribute access goes through EnumMeta)
+_TYPE_EXECUTE = int(EKUType.EXECUTE)
+_TYPE_RESPONSE = int(EKUType.RESPONSE)
+_FLAG_COMPRESSED = int(EKUFlags.COMPRESSED)
+_FLAG_LZ4 = int(EKUFlags.LZ4)
+_FLAGS_LZ4_BLOCK = _FLAG_COMPRESSED | _FLAG_LZ4
+_FLAG_BATCH_CRC = int(EKUFlags.BATCH_CRC)
+_BATCH_CRC_STRUCT = struct.Struct('!I')
+_time_ns = time.time_ns
 
 
 # ============================================================================
 # EKU HEADER - 64 bytes, fixed size
 # ============================================================================
 
-EKU_HEADER_FORMAT = '!4sIHHQQQ16sI4s'  # Network byte order (big-endian)
+EKU_HEADER_FORMAT = '!4sIHHQQQ16sII'  # Network byte order (big-endian)
 EKU_HEADER_SIZE = 60  # 4+4+2+2+8+8+8+16+4+4 = 60 bytes
+_HDR_STRUCT = struct.Struct(EKU_HEADER_FORMAT)  # compiled once
+
+_ZERO_REF = b'\x00' * 16
+_REF_CACHE: Dict[bytes, bytes] = {}  # short memory_ref -> padded 16-byte ref
+_REF_CACHE_MAX = 1024
+
 
-@dataclass
+def _pad_ref(ref: bytes) -> bytes:
+    """Pad/truncate a memory_ref to 16 bytes, interning repeated refs"""
+    if type(ref) is not bytes:  # bytearray/memoryview: unhashable, no ljust
+        return bytes(ref[:16]).ljust(16, b'\x00')
+    padded = _REF_CACHE.get(ref)
+    if padded is None:
+        padded = ref[:16].ljust(16, b'\x00')
+        if len(_REF_CACHE) < _REF_CACHE_MAX:
+            _REF_CACHE[ref] = padded
+    return padded
+
+
+@dataclass(slots=True)
 class EKUHeader:
     """
     ExecutableKnowledge Unit Header - 64 bytes
@@ -67,25 +140,34 @@ class EKUHeader:
     - payload_length: 8 bytes
     - memory_ref: 16 bytes
     - checksum: 4 bytes (CRC32 of payload)
-    - reserved: 4 bytes
+    - tool_id: 4 bytes (EXECUTE only; reserved/zero before v3.1)
     """
     version: int = SHP_VERSION
-    eku_type: EKUType = EKUType.QUERY
+    eku_type: int = EKUType.QUERY  # raw wire value; see eku_type_enum
     flags: int = 0
     timestamp: int = 0
     sequence: int = 0
     payload_length: int = 0
-    memory_ref: bytes = b'\x00' * 16
+    memory_ref: bytes = _ZERO_REF
     checksum: int = 0
+    tool_id: int = 0
 
     def __post_init__(self):
         if self.timestamp == 0:
-            self.timestamp = time.time_ns()
+            self.timestamp = _time_ns()
 
-    def pack(self) -> bytes:
-        """Pack header to 64 bytes"""
-        return struct.pack(
-            EKU_HEADER_FORMAT,
+    @property
+    def eku_type_enum(self) -> EKUType:
+        """Type as EKUType (raises ValueError for unknown wire values)"""
+        return EKUType(self.eku_type)
+
+    @property
+    def flags_enum(self) -> List[EKUFlags]:
+        """Set flags as EKUFlags members"""
+        return [flag for flag in EKUFlags if self.flags & flag]
+
+    def _fields(self) -> tuple:
+        return (
             SHP_MAGIC,
             self.version,
             self.eku_type,
@@ -93,33 +175,40 @@ class EKUHeader:
             self.timestamp,
             self.sequence,
             self.payload_length,
-            self.memory_ref[:16].ljust(16, b'\x00'),
+            self.memory_ref,  # '16s' pads/truncates to 16 bytes itself
             self.checksum,
-            b'\x00\x00\x00\x00'  # reserved
+            self.tool_id,
         )
 
+    def pack(self) -> bytes:
+        """Pack header to 64 bytes"""
+        return _HDR_STRUCT.pack(*self._fields())
+
+    def pack_into(self, buf: bytearray, offset: int = 0):
+        """Pack header into an existing buffer"""
+        _HDR_STRUCT.pack_into(buf, offset, *self._fields())
+
     @classmethod
     def unpack(cls, data: bytes) -> 'EKUHeader':
         """Unpack header from 64 bytes"""
         if len(data) < EKU_HEADER_SIZE:
             raise ValueError(f"Header too short: {len(data)} < {EKU_HEADER_SIZE}")
 
-        magic, version, eku_type, flags, timestamp, sequence, payload_length, memory_ref, checksum, _ = struct.unpack(
-            EKU_HEADER_FORMAT, data[:EKU_HEADER_SIZE]
-        )
+        magic, version, eku_type, flags, timestamp, sequence, payload_length, memory_ref, checksum, tool_id = _HDR_STRUCT.unpack_from(data, 0)
 
         if magic != SHP_MAGIC:
             raise ValueError(f"Invalid magic: {magic}")
 
         return cls(
             version=version,
-            eku_type=EKUType(eku_type),
+            eku_type=eku_type,
             flags=flags,
             timestamp=timestamp,
             sequence=sequence,
             payload_length=payload_length,
             memory_ref=memory_ref,
-            checksum=checksum
+            checksum=checksum,
+            tool_id=tool_id
         )
 
 
@@ -127,7 +216,37 @@ class EKUHeader:
 # EKU - Full ExecutableKnowledge Unit
 # ============================================================================
 
-@dataclass
+def _compress(payload: bytes, flags: int) -> tuple:
+    """Compress payload if it shrinks (LZ4 when available, zlib otherwise)"""
+    if LZ4_AVAILABLE:
+        compressed = lz4.block.compress(payload, mode='fast', acceleration=1)
+        codec_flags = _FLAGS_LZ4_BLOCK
+    else:
+        compressed = zlib.compress(payload, level=1)  # Fast compression
+        codec_flags = _FLAG_COMPRESSED
+    if len(compressed) < len(payload):
+        return compressed, flags | codec_flags
+    return payload, flags
+
+
+def _encode_frame(eku_type: int, payload: bytes, sequence: int, tool_id: int = 0) -> bytes:
+    """
+    Encode one EKU straight to bytes
+
+    Same wire output as EKU.create(...).pack(), without building the
+    EKUHeader/EKU objects: CRC over the final payload, header packed
+    last, one copy of the payload into the returned frame.
+    """
+    flags = 0
+    if len(payload) > 200:
+        payload, flags = _compress(payload, flags)
+    return _HDR_STRUCT.pack(
+        SHP_MAGIC, SHP_VERSION, eku_type, flags, _time_ns(), sequence,
+        len(payload), _ZERO_REF, _crc32(payload) & 0xFFFFFFFF, tool_id
+    ) + payload
+
+
+@dataclass(slots=True)
 class EKU:
     """
     ExecutableKnowledge Unit - The core SHP message
@@ -140,54 +259,96 @@ class EKU:
     payload: bytes = b''
 
     def __post_init__(self):
-        # Update header with payload info
-        self.header.payload_length = len(self.payload)
-        self.header.checksum = zlib.crc32(self.payload) & 0xFFFFFFFF
+        # Update header with payload info (create()/unpack() skip this via _trusted)
+        header = self.header
+        header.payload_length = len(self.payload)
+        header.checksum = 0 if header.flags & _FLAG_BATCH_CRC else _crc32(self.payload) & 0xFFFFFFFF
+
+    @classmethod
+    def _trusted(cls, header: EKUHeader, payload) -> 'EKU':
+        """Build without __post_init__ - header length/checksum already match payload"""
+        eku = object.__new__(cls)
+        eku.header = header
+        eku.payload = payload
+        return eku
 
     def pack(self) -> bytes:
-        """Pack full EKU to bytes"""
+        """Pack full EKU to bytes (one copy of the payload)"""
         return self.header.pack() + self.payload
 
+    def pack_into(self, buf: bytearray, offset: int = 0) -> int:
+        """Pack full EKU into an existing buffer at offset, return bytes written"""
+        self.header.pack_into(buf, offset)
+        start = offset + EKU_HEADER_SIZE
+        end = start + len(self.payload)
+        buf[start:end] = self.payload
+        return end - offset
+
     @classmethod
     def unpack(cls, data: bytes) -> 'EKU':
-        """Unpack EKU from bytes"""
-        header = EKUHeader.unpack(data[:EKU_HEADER_SIZE])
-        payload = data[EKU_HEADER_SIZE:EKU_HEADER_SIZE + header.payload_length]
+        """Unpack EKU from bytes (header parse and CRC run on a view, payload copied once)"""
+        return cls._unpack(data, batch_verified=False)
 
-        # Verify checksum
-        actual_checksum = zlib.crc32(payload) & 0xFFFFFFFF
-        if actual_checksum != header.checksum:
-            raise ValueError(f"Checksum mismatch: {actual_checksum} != {header.checksum}")
+    @classmethod
+    def _unpack(cls, data: bytes, batch_verified: bool, copy: bool = True) -> 'EKU':
+        """
+        Unpack, optionally leaving payload as a memoryview into data
 
-        return cls(header=header, payload=payload)
+        copy=False is for the codec's decoders, which decode the payload and
+        drop the EKU before returning - the view never outlives the call.
+        """
+        mv = memoryview(data)
+        header = EKUHeader.unpack(mv)
+        payload = mv[EKU_HEADER_SIZE:EKU_HEADER_SIZE + header.payload_length]
+        if len(payload) != header.payload_length:
+            raise ValueError(f"Truncated payload: {len(payload)} < {header.payload_length}")
+
+        # Verify checksum (batch members are covered by the batch's trailing CRC)
+        if header.flags & _FLAG_BATCH_CRC:
+            if not batch_verified:
+                raise ValueError("BATCH_CRC frame outside a verified batch - use SHPCodec.decode_batch")
+        else:
+            actual_checksum = _crc32(payload) & 0xFFFFFFFF
+            if actual_checksum != header.checksum:
+                raise ValueError(f"Checksum mismatch: {actual_checksum} != {header.checksum}")
+
+        return cls._trusted(header, bytes(payload) if copy else payload)
 
     @classmethod
     def create(cls, eku_type: EKUType, payload: bytes,
                flags: int = 0, memory_ref: bytes = b'',
-               sequence: int = 0, compress: bool = False) -> 'EKU':
+               sequence: int = 0, compress: bool = False,
+               tool_id: int = 0) -> 'EKU':
         """Factory method to create EKU"""
 
         # Compress if requested and beneficial
         if compress and len(payload) > 100:
-            compressed = zlib.compress(payload, level=1)  # Fast compression
-            if len(compressed) < len(payload):
-                payload = compressed
-                flags |= EKUFlags.COMPRESSED
+            payload, flags = _compress(payload, flags)
 
         header = EKUHeader(
             eku_type=eku_type,
             flags=flags,
             sequence=sequence,
-            memory_ref=memory_ref[:16].ljust(16, b'\x00') if memory_ref else b'\x00' * 16,
+            memory_ref=_pad_ref(memory_ref) if memory_ref else _ZERO_REF,
             payload_length=len(payload),
-            checksum=zlib.crc32(payload) & 0xFFFFFFFF
+            checksum=0 if flags & _FLAG_BATCH_CRC else _crc32(payload) & 0xFFFFFFFF,
+            tool_id=tool_id
         )
 
-        return cls(header=header, payload=payload)
+        return cls._trusted(header, payload)
 
     def get_payload(self) -> bytes:
         """Get payload, decompressing if needed"""
-        if self.header.flags & EKUFlags.COMPRESSED:
+        return bytes(self._payload_view())
+
+    def _payload_view(self):
+        """Decompressed payload, or the raw payload (a memoryview after _unpack(copy=False))"""
+        flags = self.header.flags
+        if flags & _FLAG_COMPRESSED:
+            if flags & _FLAG_LZ4:
+                if not LZ4_AVAILABLE:
+                    raise ValueError("LZ4-compressed payload but lz4 is not installed")
+                return lz4.block.decompress(self.payload)
             return zlib.decompress(self.payload)
         return self.payload
 
@@ -221,32 +382,34 @@ class SHPCodec:
     """
     High-level codec for encoding/decoding tool calls
 
-    Replaces JSON-RPC with binary protocol.
+    Replaces JSON-RPC with binary protocol. Holds reusable packers, so use
+    one codec per thread.
     """
 
     def __init__(self):
-        self._sequence = 0
+        if not MSGPACK_AVAILABLE:
+            raise ImportError("SHPCodec requires msgpack: pip install hope-memory[shp]")
+        self._sequence = count(1)  # next() increments in C, atomically under the GIL
+        self._pack_args = _new_packer()
+        self._pack_result = _new_packer(default=str)
+        # One encoder per known tool with its tool_id bound in - no map lookup per call
+        self._encoders = {name: self._make_encoder(tool_id) for name, tool_id in TOOL_TYPE_MAP.items()}
+        self._encode_unknown = self._make_encoder(0xFF)
 
     def encode_call(self, tool_name: str, args: Dict[str, Any]) -> bytes:
         """
         Encode a tool call to binary EKU
 
-        Format: [1 byte tool_id][msgpack args]
+        Format: header.tool_id + [msgpack args]
         """
-        import msgpack
-
-        tool_id = TOOL_TYPE_MAP.get(tool_name, 0xFF)
-        payload = bytes([tool_id]) + msgpack.packb(args, use_bin_type=True)
-
-        self._sequence += 1
-        eku = EKU.create(
-            eku_type=EKUType.EXECUTE,
-            payload=payload,
-            sequence=self._sequence,
-            compress=(len(payload) > 200)
-        )
+        return self._encoders.get(tool_name, self._encode_unknown)(args)
 
-        return eku.pack()
+    def _make_encoder(self, tool_id: int):
+        """Build encode_call specialized for one tool_id"""
+        def encode(args, _pack=self._pack_args, _frame=_encode_frame, _type=_TYPE_EXECUTE,
+                   _seq=self._sequence):
+            return _frame(_type, _pack(args), next(_seq), tool_id)
+        return encode
 
     def decode_call(self, data: bytes) -> tuple:
         """
@@ -254,14 +417,78 @@ class SHPCodec:
 
         Returns: (tool_name, args)
         """
-        import msgpack
+        return self._decode_call_eku(EKU._unpack(data, batch_verified=False, copy=False))
+
+    def encode_batch(self, calls: List[tuple]) -> bytearray:
+        """
+        Encode many (tool_name, args) calls into one buffer
+
+        EKUs are self-delimiting (header carries payload_length), so the
+        batch is just their concatenation - one allocation, one sendall().
+        Members are flagged BATCH_CRC and share a single trailing CRC32
+        instead of one checksum each. Returns the packed bytearray itself
+        (no final bytes() copy).
+        """
+        if not calls:
+            return bytearray()
+        ekus = [self._call_eku(tool_name, args, _FLAG_BATCH_CRC) for tool_name, args in calls]
+        size = sum(EKU_HEADER_SIZE + len(eku.payload) for eku in ekus)
+        buf = bytearray(size + _BATCH_CRC_STRUCT.size)
+        offset = 0
+        for eku in ekus:
+            offset += eku.pack_into(buf, offset)
+        _BATCH_CRC_STRUCT.pack_into(buf, size, _crc32(memoryview(buf)[:size]) & 0xFFFFFFFF)
+        return buf
+
+    def decode_batch(self, data: bytes) -> List[tuple]:
+        """
+        Decode a buffer of back-to-back call EKUs
 
-        eku = EKU.unpack(data)
-        payload = eku.get_payload()
+        Returns: [(tool_name, args), ...]
+        """
+        mv = memoryview(data)
+        batched = len(mv) >= EKU_HEADER_SIZE and bool(EKUHeader.unpack(mv).flags & _FLAG_BATCH_CRC)
+        if batched:
+            end = len(mv) - _BATCH_CRC_STRUCT.size
+            expected, = _BATCH_CRC_STRUCT.unpack_from(mv, end)
+            actual = _crc32(mv[:end]) & 0xFFFFFFFF
+            if actual != expected:
+                raise ValueError(f"Batch checksum mismatch: {actual} != {expected}")
+            mv = mv[:end]
+
+        calls = []
+        offset = 0
+        while offset < len(mv):
+            # Each frame is checked by its own flag: BATCH_CRC members are only
+            # accepted when the trailing CRC above covered them
+            eku = EKU._unpack(mv[offset:], batch_verified=batched, copy=False)
+            calls.append(self._decode_call_eku(eku))
+            offset += EKU_HEADER_SIZE + eku.header.payload_length
+        return calls
+
+    def _call_eku(self, tool_name: str, args: Dict[str, Any], flags: int = 0) -> EKU:
+        tool_id = TOOL_TYPE_MAP.get(tool_name, 0xFF)
+        payload = self._pack_args(args)
 
-        tool_id = payload[0]
+        return EKU.create(
+            eku_type=_TYPE_EXECUTE,
+            payload=payload,
+            flags=flags,
+            sequence=next(self._sequence),
+            compress=(len(payload) > 200),
+            tool_id=tool_id
+        )
+
+    @staticmethod
+    def _decode_call_eku(eku: EKU) -> tuple:
+        payload = eku._payload_view()
+
+        if eku.header.version >= _VERSION_TOOL_ID_IN_HEADER:
+            tool_id = eku.header.tool_id
+        else:
+            tool_id, payload = payload[0], payload[1:]
         tool_name = TOOL_ID_MAP.get(tool_id, f'unknown_{tool_id}')
-        args = msgpack.unpackb(payload[1:], raw=False)
+        args = _unpackb(payload)
 
         return tool_name, args
 
@@ -269,29 +496,14 @@ class SHPCodec:
         """
         Encode a result to binary EKU
         """
-        import msgpack
-
-        payload = msgpack.packb(result, use_bin_type=True, default=str)
-
-        eku = EKU.create(
-            eku_type=EKUType.RESPONSE,
-            payload=payload,
-            sequence=sequence,
-            compress=(len(payload) > 200)
-        )
-
-        return eku.pack()
+        return _encode_frame(_TYPE_RESPONSE, self._pack_result(result), sequence)
 
     def decode_result(self, data: bytes) -> Dict[str, Any]:
         """
         Decode binary EKU to result dict
         """
-        import msgpack
-
-        eku = EKU.unpack(data)
-        payload = eku.get_payload()
-
-        return msgpack.unpackb(payload, raw=False)
+        eku = EKU._unpack(data, batch_verified=False, copy=False)
+        return _unpackb(eku._payload_view())
 
 
 # ============================================================================
@@ -300,8 +512,6 @@ class SHPCodec:
 
 def benchmark():
     """Compare JSON vs SHP performance"""
-    import json
-    import time
 
     codec = SHPCodec()
 
@@ -364,8 +574,6 @@ def benchmark():
 
 def benchmark_memory_chain():
     """Benchmark memory chain vs full reload - THE REAL WIN"""
-    import time
-    import json
 
     # Simulate conversation context (what traditional APIs send EVERY request)
     context = {
@@ -0,0 +1,260 @@
+"""
+Cognitive memory layers
+"""
+import dataclasses
+import json
+import os
+import random
+from datetime import datetime
+
+import pytest
+
+from hope_memory import cognitive
+from hope_memory.cognitive import (
+    AssociativeNetwork, HopeMemory, LongTermMemory, RelationalMemory, ShortTermMemory, Thought, WorkingMemory,
+)
+
+
+def test_torn_journal_tail_survives_repeated_reopen(tmp_path):
+    rel = RelationalMemory(tmp_path)
+    rel.meet("Alice", "friend")
+    rel.flush()
+    rel.close()
+
+    # Simulate a crash mid-append: a partial upsert with no newline
+    with open(tmp_path / "people.jsonl", "ab") as f:
+        f.write(b'{"op":"upsert","key":"bo')
+
+    for _ in range(2):
+        rel = RelationalMemory(tmp_path)
+        assert rel.get("alice").role == "friend"
+        assert rel.get("bo") is None
+        rel.close()
+
+    rel = RelationalMemory(tmp_path)
+    rel.meet("Bob", "colleague")
+    rel.flush()
+    rel.close()
+    assert RelationalMemory(tmp_path).get("bob").role == "colleague"
+
+
+def test_compact_keeps_other_instances_readable(tmp_path):
+    rel = RelationalMemory(tmp_path)
+    for i in range(100):
+        rel.meet(f"p{i}", "x" * 50)
+    rel.flush()
+
+    a = RelationalMemory(tmp_path)  # lazy spans into the mmapped journal
+    b = RelationalMemory(tmp_path)
+    b.compact()
+    assert a.get("p99").role == "x" * 50
+    assert RelationalMemory(tmp_path).get("p99").role == "x" * 50
+
+
+def test_consolidation_threshold_is_inclusive():
+    stm = ShortTermMemory()
+    for imp in (0.5, 0.7, 0.9):
+        stm.store(Thought(content=f"imp {imp}", importance=imp))
+    assert [t.importance for t in stm.get_for_consolidation(0.7)] == [0.7, 0.9]
+    assert [t.importance for t in stm.get_for_consolidation(0.9)] == [0.9]
+
+
+class _FakeCollection:
+    """Minimal in-memory stand-in for a ChromaDB collection"""
+
+    def __init__(self):
+        self.docs = {}
+
+    def upsert(self, documents, metadatas, ids):
+        self.docs.update(zip(ids, documents))
+
+    def query(self, query_texts, n_results):
+        hits = [(i, d) for i, d in self.docs.items() if query_texts[0] in d][:n_results]
+        return {"ids": [[i for i, _ in hits]], "documents": [[d for _, d in hits]],
+                "distances": [[0.0] * len(hits)]}
+
+    def count(self):
+        return len(self.docs)
+
+
+def test_search_cache_sees_new_writes_and_resists_mutation(tmp_path):
+    ltm = LongTermMemory(tmp_path)
+    ltm.collection = _FakeCollection()
+
+    ltm.store(Thought(content="apple pie"))
+    assert [h["content"] for h in ltm.search("apple")] == ["apple pie"]
+
+    ltm.search("apple")[0]["content"] = "mutated"
+    assert ltm.search("apple")[0]["content"] == "apple pie"
+
+    ltm.store(Thought(content="apple tart", importance=0.9))
+    assert len(ltm.search("apple")) == 2
+
+
+def test_failed_flush_keeps_the_batch(tmp_path):
+    class FlakyCollection(_FakeCollection):
+        fail = True
+
+        def upsert(self, **kwargs):
+            if self.fail:
+                self.fail = False
+                raise RuntimeError("vector store unavailable")
+            super().upsert(**kwargs)
+
+    ltm = LongTermMemory(tmp_path)
+    ltm.collection = FlakyCollection()
+    with pytest.raises(RuntimeError):
+        ltm.store_many([Thought(content="kept"), Thought(content="also kept", importance=0.8)])
+    ltm.flush()
+    assert ltm.count() == 2
+    with ltm.pool.get() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM memories").fetchone()[0] == 2
+
+
+def test_dropped_instances_are_freed_and_flushed(tmp_path):
+    import gc
+    import weakref
+
+    memory = HopeMemory(str(tmp_path))
+    memory.relational.meet("Zed")
+    ref = weakref.ref(memory.relational)
+    del memory
+    gc.collect()
+
+    assert ref() is None  # no exit hook keeps it alive
+    assert RelationalMemory(tmp_path).get("zed") is not None
+
+    # Cyclic GC may finalize the journal handle before the store itself
+    rel = RelationalMemory(tmp_path)
+    rel.meet("Quinn")
+    rel._log_f.close()
+    del rel
+    gc.collect()
+    assert RelationalMemory(tmp_path).get("quinn") is not None
+
+
+@pytest.mark.skipif(not os.path.isdir("/proc/self/fd"), reason="needs /proc/self/fd")
+def test_close_releases_pooled_connections(tmp_path):
+    def open_fds():
+        return len(os.listdir("/proc/self/fd"))
+
+    before = open_fds()
+    for i in range(20):
+        memory = HopeMemory(str(tmp_path / str(i)))
+        memory.think("worth keeping", importance=0.9)
+        memory.consolidate()
+        memory.close()
+    assert open_fds() - before <= 2
+
+    # A path shared by two instances keeps its pool until the last one closes
+    a, b = LongTermMemory(tmp_path), LongTermMemory(tmp_path)
+    a.close()
+    b.store_many([Thought(content="still writable")])
+    b.close()
+
+
+def test_compact_keeps_records_from_other_instances(tmp_path):
+    a, b = RelationalMemory(tmp_path), RelationalMemory(tmp_path)
+    a.meet("early")
+    a.flush()
+    b.compact()  # b never saw "early"
+    a.meet("late_from_a")  # a still holds the pre-compaction journal
+    a.flush()
+
+    fresh = RelationalMemory(tmp_path)
+    assert fresh.get("early") is not None
+    assert fresh.get("late_from_a") is not None
+
+
+def test_compact_skips_while_another_instance_holds_the_lock(tmp_path):
+    rel = RelationalMemory(tmp_path)
+    rel.meet("Ann")
+    rel.flush()
+    (tmp_path / "people.compact.lock").touch()
+    rel.compact()
+    assert (tmp_path / "people.jsonl").stat().st_size > 0  # journal left alone
+    assert RelationalMemory(tmp_path).get("ann") is not None
+
+
+def test_legacy_association_keys_are_rekeyed_on_load(tmp_path):
+    # associations.json as written before keys were casefolded
+    legacy = {
+        "straße|x": {"concept_a": "Straße", "concept_b": "x", "strength": 0.6, "formed": "2024-01-01T00:00:00"},
+        "a|b": {"concept_a": "a", "concept_b": "b", "strength": 0.5, "formed": "2024-01-01T00:00:00"},
+    }
+    (tmp_path / "associations.json").write_text(json.dumps(legacy, indent=2), encoding="utf-8")
+
+    net = AssociativeNetwork(tmp_path)
+    net.associate("STRASSE", "X")
+    assert net.get_associated("strasse") == [("x", pytest.approx(0.7))]
+    assert len(net.associations) == 2
+    net.close()
+
+    net = AssociativeNetwork(tmp_path)
+    assert sorted(net.associations) == ["a|b", "strasse|x"]
+    assert net.get_associated("straße") == [("x", pytest.approx(0.7))]
+    net.compact()
+    net.close()
+    assert sorted(json.loads((tmp_path / "associations.json").read_text(encoding="utf-8"))) == ["a|b", "strasse|x"]
+
+
+def test_thought_caches_stay_out_of_dataclass_fields():
+    t = Thought("Hello World", importance=0.8)
+    t.id, t.content_lower  # populate the caches
+    assert [f.name for f in dataclasses.fields(t)] == ["content", "timestamp", "importance", "emotion", "source", "related_to"]
+    copy = Thought(**dataclasses.asdict(t))
+    assert copy == t and copy.id == t.id
+    assert dataclasses.replace(t, importance=0.1).id == t.id
+
+
+def test_exit_flush_continues_past_a_failing_store(tmp_path, capsys):
+    class Broken:
+        def flush(self):
+            raise OSError("disk gone")
+
+    broken = Broken()
+    rel = RelationalMemory(tmp_path)
+    rel.meet("Alice", "friend")
+    cognitive._EXIT_FLUSH.add(broken)
+    try:
+        cognitive._flush_at_exit()
+    finally:
+        cognitive._EXIT_FLUSH.discard(broken)
+    assert "Broken at exit failed" in capsys.readouterr().err
+    assert not rel._pending
+    rel.close()
+
+
+def test_decay_honours_an_explicit_zero_clock():
+    t = Thought("epoch", timestamp=datetime.fromtimestamp(3600), importance=0.8)
+    assert t.decay(half_life=3600, now=0.0) == pytest.approx(1.6)
+    assert t.decay(half_life=3600, now=3600.0) == pytest.approx(0.8)
+
+
+def test_working_memory_ranking_matches_sorting_by_decay(monkeypatch):
+    now = 1_700_000_000.0
+    monkeypatch.setattr(cognitive.time, "time", lambda: now)
+    rng = random.Random(7)
+    for _ in range(50):
+        thoughts = []
+        for i in range(rng.randint(1, 40)):
+            if thoughts and rng.random() < 0.2:  # exact tie with an earlier thought
+                twin = rng.choice(thoughts)
+                ts, imp = twin.timestamp, twin.importance
+            else:
+                ts = datetime.fromtimestamp(now - rng.uniform(0, 12 * 3600))
+                imp = rng.choice([0.0, 1.0, rng.random()])
+            thoughts.append(Thought(f"t{i}", timestamp=ts, importance=imp))
+
+        wm = WorkingMemory(capacity=len(thoughts))
+        for t in thoughts:
+            wm.add(t)
+        # sorted() is stable, so ties keep insertion order
+        expected = sorted(thoughts, key=lambda t: t.decay(now=now), reverse=True)
+        assert [t.id for t in wm.get_active()] == [t.id for t in expected]
+
+        threshold = rng.choice([0.0, 0.05, 0.1, 0.3])
+        wm.clear_decayed(threshold)
+        kept = [t for t in expected if t.decay(now=now) > threshold]
+        assert [t.id for t in wm.get_active()] == [t.id for t in kept]
+        assert set(wm.items) == {t.id for t in kept}
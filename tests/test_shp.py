@@ -0,0 +1,79 @@
+"""
+Silent Hope Protocol codec
+"""
+import struct
+import zlib
+
+import pytest
+
+from hope_memory.shp import protocol
+from hope_memory.shp import SHPCodec
+
+pytestmark = pytest.mark.skipif(not protocol.MSGPACK_AVAILABLE, reason="needs msgpack or ormsgpack")
+
+
+def test_batch_members_are_integrity_checked():
+    codec = SHPCodec()
+    batch = codec.encode_batch([("hope_feel", {"msg": "hello"}), ("hope_who", {})])
+    assert codec.decode_batch(batch) == [("hope_feel", {"msg": "hello"}), ("hope_who", {})]
+
+    corrupted = bytearray(batch)
+    corrupted[corrupted.find(b"hello")] = ord("j")
+    with pytest.raises(ValueError):
+        codec.decode_batch(bytes(corrupted))
+
+    # A batch member is only trusted where the trailing batch CRC covers it
+    with pytest.raises(ValueError):
+        codec.decode_call(bytes(corrupted))
+    with pytest.raises(ValueError):
+        codec.decode_batch(codec.encode_call("hope_who", {}) + bytes(corrupted)[:-4])
+
+
+def test_unpack_returns_bytes_and_releases_the_buffer():
+    codec = SHPCodec()
+    recv = bytearray(protocol.EKU.create(protocol.EKUType.QUERY, b"hello").pack())
+
+    eku = protocol.EKU.unpack(recv)
+    assert isinstance(eku.payload, bytes)
+    assert eku.payload.decode() == "hello"
+    recv.extend(b"more")  # raises BufferError if still pinned by a view
+
+    recv = bytearray(codec.encode_call("hope_who", {"a": 1}))
+    assert codec.decode_call(recv) == ("hope_who", {"a": 1})
+    recv.extend(b"more")
+
+
+def test_memory_ref_accepts_any_bytes_like():
+    expected = b"chain:latest".ljust(16, b"\x00")
+    for ref in (b"chain:latest", bytearray(b"chain:latest"), memoryview(b"chain:latest")):
+        eku = protocol.EKU.create(protocol.EKUType.QUERY, b"", memory_ref=ref)
+        assert protocol.EKU.unpack(eku.pack()).header.memory_ref == expected
+
+
+def test_public_constructor_recomputes_a_stale_checksum():
+    stale = protocol.EKU.create(protocol.EKUType.QUERY, b"hello").header
+    eku = protocol.EKU(header=stale, payload=b"jello")  # same length, old CRC
+    assert protocol.EKU.unpack(eku.pack()).payload == b"jello"
+
+
+def _v30_call_frame(tool_id, args, compress=False):
+    """An EXECUTE frame as a v3.0 peer sends it: tool_id byte + msgpack, reserved bytes zero"""
+    payload = bytes([tool_id]) + protocol._new_packer()(args)
+    flags = 0
+    if compress:
+        payload, flags = zlib.compress(payload, level=1), protocol.EKUFlags.COMPRESSED
+    return struct.pack(
+        "!4sIHHQQQ16sI4s", b"HOPE", 0x00030000, protocol.EKUType.EXECUTE, flags, 0, 1,
+        len(payload), b"\x00" * 16, zlib.crc32(payload), b"\x00" * 4,
+    ) + payload
+
+
+def test_decode_call_reads_v30_frames():
+    codec = SHPCodec()
+    frame = _v30_call_frame(protocol.TOOL_TYPE_MAP["hope_feel"], {"msg": "hello"})
+    assert codec.decode_call(frame) == ("hope_feel", {"msg": "hello"})
+
+    args = {"content": "x" * 500}
+    frame = _v30_call_frame(protocol.TOOL_TYPE_MAP["hope_remember"], args, compress=True)
+    assert len(frame) < 500  # really went through zlib
+    assert codec.decode_call(frame) == ("hope_remember", args)